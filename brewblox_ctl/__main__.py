@@ -12,10 +12,44 @@ from click.exceptions import ClickException
 from dotenv import load_dotenv
 
 from brewblox_ctl import click_helpers, utils
-from brewblox_ctl.commands import (add_service, auth, backup, configuration,
-                                   database, diagnostic, docker, experimental,
-                                   fix, flash, http, install, service,
-                                   snapshot, tools, update)
+
+# Top-level commands, and the module where they are defined
+# Modules are only imported when one of their commands is used
+# Commands are listed in help output in this order
+COMMANDS = {
+    **dict.fromkeys(['up', 'down', 'restart', 'follow', 'kill'],
+                    'brewblox_ctl.commands.docker'),
+    **dict.fromkeys(['install', 'makecert'],
+                    'brewblox_ctl.commands.install'),
+    **dict.fromkeys(['config'],
+                    'brewblox_ctl.commands.configuration'),
+    **dict.fromkeys(['auth'],
+                    'brewblox_ctl.commands.auth'),
+    **dict.fromkeys(['update', 'update-ctl'],
+                    'brewblox_ctl.commands.update'),
+    **dict.fromkeys(['http'],
+                    'brewblox_ctl.commands.http'),
+    **dict.fromkeys(['discover-spark', 'add-spark', 'add-tilt', 'add-plaato', 'add-node-red'],
+                    'brewblox_ctl.commands.add_service'),
+    **dict.fromkeys(['service'],
+                    'brewblox_ctl.commands.service'),
+    **dict.fromkeys(['flash', 'wifi', 'particle'],
+                    'brewblox_ctl.commands.flash'),
+    **dict.fromkeys(['esptool', 'dotenv'],
+                    'brewblox_ctl.commands.tools'),
+    **dict.fromkeys(['log', 'coredump', 'termbin'],
+                    'brewblox_ctl.commands.diagnostic'),
+    **dict.fromkeys(['fix'],
+                    'brewblox_ctl.commands.fix'),
+    **dict.fromkeys(['database'],
+                    'brewblox_ctl.commands.database'),
+    **dict.fromkeys(['backup'],
+                    'brewblox_ctl.commands.backup'),
+    **dict.fromkeys(['snapshot'],
+                    'brewblox_ctl.commands.snapshot'),
+    **dict.fromkeys(['experimental'],
+                    'brewblox_ctl.commands.experimental'),
+}
 
 
 def escalate(ex):
@@ -47,25 +81,8 @@ def main(args=sys.argv[1:]):
             raise SystemExit(1)
 
         @click.group(
-            cls=click_helpers.OrderedCommandCollection,
-            sources=[
-                docker.cli,
-                install.cli,
-                configuration.cli,
-                auth.cli,
-                update.cli,
-                http.cli,
-                add_service.cli,
-                service.cli,
-                flash.cli,
-                tools.cli,
-                diagnostic.cli,
-                fix.cli,
-                database.cli,
-                backup.cli,
-                snapshot.cli,
-                experimental.cli,
-            ])
+            cls=click_helpers.LazyCommandCollection,
+            lazy_sources=COMMANDS)
         @click.option('-y', '--yes',
                       is_flag=True,
                       help='Do not prompt to confirm commands.')
@@ -2,6 +2,9 @@
 Custom overrides for click
 """
 
+import importlib
+from typing import Dict
+
 import click
 
 
@@ -32,3 +35,29 @@ class OrderedCommandCollection(click.CommandCollection):
         for source in self.sources:
             rv += source.list_commands(ctx)
         return rv
+
+
+class LazyCommandCollection(click.Group):
+    """
+    Click group that only imports command modules when a command is resolved.
+
+    `lazy_sources` maps command names to the module that defines them.
+    The module is expected to have a `cli` group that includes the command.
+
+    Commands are listed in order of insertion,
+    without importing any of the modules.
+    """
+
+    def __init__(self, *args, lazy_sources: Dict[str, str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_sources = lazy_sources or {}
+
+    def list_commands(self, ctx):
+        return list(self.lazy_sources.keys())
+
+    def get_command(self, ctx, cmd_name):
+        module_name = self.lazy_sources.get(cmd_name)
+        if module_name is None:
+            return None
+        module = importlib.import_module(module_name)
+        return module.cli.get_command(ctx, cmd_name)
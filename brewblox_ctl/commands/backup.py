@@ -3,14 +3,18 @@ Saving / loading backups
 """
 
 
+import io
 import json
 import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import suppress
 from datetime import datetime
 from glob import glob
 from os import getgid, getuid, mkdir
 from pathlib import Path
-from tempfile import NamedTemporaryFile, TemporaryDirectory
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile, TemporaryDirectory
+from time import monotonic
+from typing import IO, Any, Generator, Iterable, List, Optional, Tuple
 
 import click
 import requests
@@ -18,8 +22,34 @@ import urllib3
 from dotenv import load_dotenv
 from ruamel.yaml import YAML
 
-from brewblox_ctl import click_helpers, const, utils
+from brewblox_ctl import click_helpers, json_stream, requests_helpers, utils
 from brewblox_ctl.commands import http
+from brewblox_ctl.commands import update as update_commands
+
+# Max number of Spark services that are exported simultaneously
+SPARK_EXPORT_WORKERS = 4
+
+# Max number of Spark services that are restored simultaneously
+SPARK_RESTORE_WORKERS = 4
+
+# Exporting or restoring blocks may take a while if the controller has many blocks
+SPARK_EXPORT_TIMEOUT_S = 60
+SPARK_RESTORE_TIMEOUT_S = 60
+
+# Archive entries are streamed in chunks of this size
+ZIP_BUFFER_SIZE = 64 * 1024
+
+# Spark exports are kept in memory up to this size, and then moved to a temporary file
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# Datastore entries are restored in batches of this size
+DATASTORE_BATCH_SIZE = 250
+
+# Max number of datastore batches that are written simultaneously
+DATASTORE_WORKERS = 4
+
+# Min interval between progress updates during long-running operations
+PROGRESS_INTERVAL_S = 2
 
 
 @click.group(cls=click_helpers.OrderedGroup)
@@ -27,6 +57,42 @@ def cli():
     """Top-level commands"""
 
 
+def write_zip_entry(zipf: zipfile.ZipFile, name: str, chunks: Iterable[bytes], start: float):
+    """
+    Writes the archive entry chunk by chunk, without keeping the full content in memory.
+    `start` is the monotonic timestamp at which the export of this entry started.
+    """
+    size = 0
+    with zipf.open(name, 'w') as dest:
+        for chunk in chunks:
+            dest.write(chunk)
+            size += len(chunk)
+
+    duration = max(monotonic() - start, 0.001)
+    utils.info(f'Exported {name}: {size / 1024:.1f} KiB in {duration:.1f}s ({size / 1024 / duration:.1f} KiB/s)')
+
+
+def read_chunks(f: IO[bytes]) -> Iterable[bytes]:
+    return iter(lambda: f.read(ZIP_BUFFER_SIZE), b'')
+
+
+def export_spark(session: requests.Session, spark: str) -> Tuple[IO[bytes], float]:
+    """
+    Downloads blocks from the Spark service.
+    Returns a rewound file with the response body, and the start timestamp.
+    """
+    start = monotonic()
+    resp = session.post(f'{utils.host_url()}/{spark}/blocks/backup/save',
+                        timeout=SPARK_EXPORT_TIMEOUT_S,
+                        stream=True)
+    resp.raise_for_status()
+    spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in resp.iter_content(ZIP_BUFFER_SIZE):
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, start
+
+
 @cli.group()
 def backup():
     """Save or load backups."""
@@ -97,29 +163,41 @@ def save(save_compose, ignore_spark_error):
     utils.info('Exporting .env')
     zipf.write('.env')
 
-    # Always save datastore
-    utils.info('Exporting datastore')
-    resp = requests.post(store_url + '/mget',
-                         json={'namespace': '', 'filter': '*'},
-                         verify=False)
-    resp.raise_for_status()
-    zipf.writestr('global.redis.json', resp.text)
-
-    if save_compose:
-        utils.info('Exporting docker-compose.yml')
-        zipf.write('docker-compose.yml')
-
-    for spark in sparks:
-        utils.info(f'Exporting Spark blocks from `{spark}`')
-        resp = requests.post(f'{utils.host_url()}/{spark}/blocks/backup/save', verify=False)
-        try:
-            resp.raise_for_status()
-            zipf.writestr(spark + '.spark.json', resp.text)
-        except Exception as ex:
-            if ignore_spark_error:
-                utils.info(f'Skipping Spark `{spark}` due to error: {str(ex)}')
-            else:
-                raise ex
+    with requests_helpers.session() as session, \
+            ThreadPoolExecutor(max_workers=SPARK_EXPORT_WORKERS) as executor:
+        # Spark exports are slow, and run in the background
+        spark_futures = {
+            spark: executor.submit(export_spark, session, spark)
+            for spark in sparks
+        }
+
+        # Always save datastore
+        utils.info('Exporting datastore')
+        start = monotonic()
+        resp = session.post(store_url + '/mget',
+                            json={'namespace': '', 'filter': '*'},
+                            stream=True)
+        resp.raise_for_status()
+        write_zip_entry(zipf, 'global.redis.json', resp.iter_content(ZIP_BUFFER_SIZE), start)
+
+        if save_compose:
+            utils.info('Exporting docker-compose.yml')
+            zipf.write('docker-compose.yml')
+
+        # Results are written in order of declaration, not in order of completion
+        for spark, future in spark_futures.items():
+            utils.info(f'Exporting Spark blocks from `{spark}`')
+            try:
+                spool, start = future.result()
+                with spool:
+                    write_zip_entry(zipf, spark + '.spark.json', read_chunks(spool), start)
+            except Exception as ex:
+                if ignore_spark_error:
+                    utils.info(f'Skipping Spark `{spark}` due to error: {str(ex)}')
+                else:
+                    for f in spark_futures.values():
+                        f.cancel()
+                    raise ex
 
     for fname in [
         *glob('node-red/*.js*'),
@@ -134,12 +212,154 @@ def save(save_compose, ignore_spark_error):
     utils.info('Done!')
 
 
-def mset(data):
-    with NamedTemporaryFile('w') as tmp:
-        utils.show_data('datastore', data)
-        json.dump(data, tmp)
-        tmp.flush()
-        utils.sh(f'{const.CLI} http post --quiet {utils.datastore_url()}/mset -f {tmp.name}')
+def batched(items: Iterable[Any], size: int) -> Generator[List[Any], None, None]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_json_array(zipf: zipfile.ZipFile, name: str, key: Optional[str] = None) -> Generator[Any, None, None]:
+    """
+    Yields items from a JSON array in the archive entry, without reading the full entry.
+    """
+    with zipf.open(name) as f:
+        yield from json_stream.iter_array(io.TextIOWrapper(f, encoding='utf-8'), key)
+
+
+def couchdb_values(docs: Iterable[dict], db: str) -> Generator[dict, None, None]:
+    """
+    Converts UI/automation documents from CouchDB to Redis datastore values.
+    The IDs here are formatted as {moduleId}__{objId}
+    The module ID becomes part of the Redis namespace
+    """
+    for d in docs:
+        segments = d['_id'].split('__', 1)
+        # Drop invalid names (not prefixed with module ID)
+        if len(segments) != 2:
+            continue
+        d['namespace'] = f'{db}:{segments[0]}'
+        d['id'] = segments[1]
+        del d['_id']
+        yield d
+
+
+def couchdb_spark_values(docs: Iterable[dict], db: str) -> Generator[dict, None, None]:
+    """
+    Converts Spark service documents from CouchDB to Redis datastore values.
+    There is no module ID field here
+    """
+    for d in docs:
+        d['namespace'] = db
+        d['id'] = d['_id']
+        del d['_id']
+        yield d
+
+
+def mset(session: requests.Session, values: Iterable[dict], source: str):
+    """
+    Writes values to the datastore in concurrent batches.
+
+    Values are consumed lazily.
+    Only a limited number of batches is kept in memory at any time.
+    """
+    opts = utils.get_opts()
+    url = f'{utils.datastore_url()}/mset'
+    count = 0
+    last_progress = monotonic()
+
+    def post(batch: List[dict]) -> int:
+        resp = session.post(url, json={'values': batch})
+        resp.raise_for_status()
+        return len(batch)
+
+    def collect(done):
+        nonlocal count, last_progress
+        count += sum(f.result() for f in done)
+        if monotonic() - last_progress >= PROGRESS_INTERVAL_S:
+            last_progress = monotonic()
+            utils.info(f'Loaded {count} entries from {source} ...')
+
+    utils.info(f'Loading entries from {source} ...')
+    with ThreadPoolExecutor(max_workers=DATASTORE_WORKERS) as executor:
+        pending = set()
+        for batch in batched(values, DATASTORE_BATCH_SIZE):
+            utils.show_data(f'{source} ({len(batch)} entries)', batch)
+            if opts.dry_run:
+                continue
+            if len(pending) >= DATASTORE_WORKERS * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(post, batch))
+        collect(wait(pending).done)
+
+    utils.info(f'Loaded {count} entries from {source}')
+
+
+def restore_spark(session: requests.Session, spark: str, data: bytes) -> float:
+    """
+    Uploads blocks to the Spark service.
+    Returns the duration of the upload.
+    """
+    start = monotonic()
+    resp = session.post(f'{utils.host_url()}/{spark}/blocks/backup/load',
+                        data=data,
+                        headers={'Content-Type': 'application/json'},
+                        timeout=SPARK_RESTORE_TIMEOUT_S)
+    resp.raise_for_status()
+    return monotonic() - start
+
+
+def restore_sparks(zipf: zipfile.ZipFile, spark_files: List[str]):
+    """
+    Restores all Spark services simultaneously,
+    and then restarts all restored services with a single command.
+    """
+    opts = utils.get_opts()
+    sudo = utils.optsudo()
+    host_url = utils.host_url()
+    restored: List[str] = []
+    failed: List[str] = []
+
+    with requests_helpers.session() as session, \
+            ThreadPoolExecutor(max_workers=SPARK_RESTORE_WORKERS) as executor:
+        futures = {}
+        for f in spark_files:
+            spark = f[:-len('.spark.json')]
+            utils.info(f'Writing blocks to Spark service `{spark}`')
+            data = zipf.read(f)
+            utils.show_data(f, data.decode())
+            if opts.dry_run:
+                restored.append(spark)
+            else:
+                futures[spark] = executor.submit(restore_spark, session, spark, data)
+
+        for spark, future in futures.items():
+            try:
+                duration = future.result()
+                utils.info(f'Wrote blocks to Spark service `{spark}` in {duration:.1f}s')
+                restored.append(spark)
+            except Exception as ex:
+                utils.warn(f'Failed to write blocks to Spark service `{spark}`: {utils.strex(ex)}')
+                failed.append(spark)
+
+        if restored:
+            utils.info('Restarting Spark services ...')
+            utils.sh(f'{sudo}docker compose restart {" ".join(restored)}')
+
+        if restored and not opts.dry_run:
+            utils.info('Waiting for Spark services ...')
+            # Evaluate results to raise any errors
+            list(executor.map(lambda spark: http.wait(f'{host_url}/{spark}/system/ping', info_updates=True),
+                              restored))
+
+    if failed:
+        utils.error(f'Failed to restore Spark services: {", ".join(failed)}')
+        raise SystemExit(1)
 
 
 @backup.command()
@@ -204,7 +424,6 @@ def load(archive,
     urllib3.disable_warnings()
 
     sudo = utils.optsudo()
-    host_url = utils.host_url()
     store_url = utils.datastore_url()
 
     yaml = YAML()
@@ -247,68 +466,39 @@ def load(archive,
     if load_datastore:
         if redis_file in available or couchdb_files:
             utils.info('Waiting for the datastore ...')
-            utils.sh(f'{const.CLI} http wait {store_url}/ping')
+            utils.ctl(http.http, 'wait', f'{store_url}/ping')
             # Wipe UI/Automation, but leave Spark files
-            mdelete_cmd = '{} http post {}/mdelete --quiet -d \'{{"namespace":"{}", "filter":"*"}}\''
-            utils.sh(mdelete_cmd.format(const.CLI, store_url, 'brewblox-ui-store'))
-            utils.sh(mdelete_cmd.format(const.CLI, store_url, 'brewblox-automation'))
+            for namespace in ['brewblox-ui-store', 'brewblox-automation']:
+                utils.ctl(http.http, 'post', '--quiet', f'{store_url}/mdelete',
+                          '-d', json.dumps({'namespace': namespace, 'filter': '*'}))
         else:
             utils.info('No datastore files found in backup archive')
 
-        if redis_file in available:
-            data = json.loads(zipf.read(redis_file).decode())
-            utils.info(f'Loading {len(data["values"])} entries from Redis datastore')
-            mset(data)
-
-        # Backwards compatibility for UI/automation files from CouchDB
-        # The IDs here are formatted as {moduleId}__{objId}
-        # The module ID becomes part of the Redis namespace
-        for db in ['brewblox-ui-store', 'brewblox-automation']:
-            fname = f'{db}.datastore.json'
-            if fname not in available:
-                continue
-            docs = json.loads(zipf.read(fname).decode())
-            # Drop invalid names (not prefixed with module ID)
-            docs[:] = [d for d in docs if len(d['_id'].split('__', 1)) == 2]
-            # Add namespace / ID fields
-            for d in docs:
-                segments = d['_id'].split('__', 1)
-                d['namespace'] = f'{db}:{segments[0]}'
-                d['id'] = segments[1]
-                del d['_id']
-            utils.info(f'Loading {len(docs)} entries from database `{db}`')
-            mset({'values': docs})
-
-        # Backwards compatibility for Spark service files
-        # There is no module ID field here
-        spark_db = 'spark-service'
-        spark_fname = f'{spark_db}.datastore.json'
-        if spark_fname in available:
-            docs = json.loads(zipf.read(spark_fname).decode())
-            for d in docs:
-                d['namespace'] = spark_db
-                d['id'] = d['_id']
-                del d['_id']
-            utils.info(f'Loading {len(docs)} entries from database `{spark_db}`')
-            mset({'values': docs})
+        with requests_helpers.session() as session:
+            if redis_file in available:
+                values = read_json_array(zipf, redis_file, 'values')
+                mset(session, values, 'Redis datastore')
+
+            # Backwards compatibility for UI/automation files from CouchDB
+            for db in ['brewblox-ui-store', 'brewblox-automation']:
+                fname = f'{db}.datastore.json'
+                if fname in available:
+                    values = couchdb_values(read_json_array(zipf, fname), db)
+                    mset(session, values, f'database `{db}`')
+
+            # Backwards compatibility for Spark service files
+            spark_db = 'spark-service'
+            spark_fname = f'{spark_db}.datastore.json'
+            if spark_fname in available:
+                values = couchdb_spark_values(read_json_array(zipf, spark_fname), spark_db)
+                mset(session, values, f'database `{spark_db}`')
 
     if load_spark:
-        sudo = utils.optsudo()
-
-        if not spark_files:
+        if spark_files:
+            restore_sparks(zipf, spark_files)
+        else:
             utils.info('No Spark files found in backup archive')
 
-        for f in spark_files:
-            spark = f[:-len('.spark.json')]
-            utils.info(f'Writing blocks to Spark service `{spark}`')
-            with NamedTemporaryFile('w') as tmp:
-                data = json.loads(zipf.read(f).decode())
-                utils.show_data(spark, data)
-                json.dump(data, tmp)
-                tmp.flush()
-                utils.sh(f'{const.CLI} http post {host_url}/{spark}/blocks/backup/load -f {tmp.name}')
-                utils.sh(f'{sudo}docker compose restart {spark}')
-
     if load_node_red and node_red_files:
         sudo = ''
         if [getgid(), getuid()] != [1000, 1000]:
@@ -331,6 +521,6 @@ def load(archive,
 
     if update:
         utils.info('Updating brewblox ...')
-        utils.sh(f'{const.CLI} update')
+        utils.ctl(update_commands.update)
 
     utils.info('Done!')
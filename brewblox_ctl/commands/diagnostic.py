@@ -8,7 +8,8 @@ from pathlib import Path
 
 import click
 
-from brewblox_ctl import actions, click_helpers, const, utils
+from brewblox_ctl import actions, click_helpers, utils
+from brewblox_ctl.commands import http
 
 
 def create():
@@ -19,6 +20,14 @@ def append(s):
     utils.sh(s + ' >> brewblox.log 2>&1', check=False)
 
 
+def append_ctl(cmd: click.Command, *args: str):
+    with open('brewblox.log', 'a') as f:
+        try:
+            utils.ctl(cmd, *args, stdout=f)
+        except Exception as ex:
+            f.write(utils.strex(ex) + '\n')
+
+
 def header(s):
     decorate_len = 120 - len(s)
     decorate_start = '+' * math.ceil(decorate_len / 2)
@@ -129,7 +138,7 @@ def log(add_compose, add_system, upload):
     for svc in services:
         utils.info(f'Writing {svc} blocks ...')
         header(f'Blocks: {svc}')
-        append(f'{const.CLI} http post --pretty {host_url}/{svc}/blocks/all/read')
+        append_ctl(http.http, 'post', '--pretty', '--allow-fail', f'{host_url}/{svc}/blocks/all/read')
 
     # Add system diagnostics
     if add_system:
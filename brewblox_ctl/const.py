@@ -1,6 +1,7 @@
 """
 Const values
 """
+import os
 import sys
 from pathlib import Path
 
@@ -29,9 +30,16 @@ DIR_DEPLOYED = DIR_CTL_ROOT / 'deployed'
 
 # File locations
 CONFIG_FILE = Path('brewblox.yml').resolve()
+CONFIG_CACHE_FILE = Path('.brewblox.cache.json').resolve()
 PASSWD_FILE = Path('auth/users.passwd').resolve()
 COMPOSE_FILE = Path('docker-compose.yml').resolve()
 COMPOSE_SHARED_FILE = Path('docker-compose.shared.yml').resolve()
+DOCKER_SOCKET = Path('/var/run/docker.sock')
+
+# User-specific cache files
+CACHE_DIR = Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'brewblox-ctl'
+CAPABILITIES_CACHE_FILE = CACHE_DIR / 'capabilities.json'
+CAPABILITIES_CACHE_TTL_S = 300
 
 # Apt dependencies required to run brewblox
 # This is a duplicate of the list in bootstrap-install.sh
@@ -0,0 +1,112 @@
+"""
+Incremental parsing of large JSON documents
+"""
+
+import json
+from typing import IO, Any, Generator, Optional
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+class JsonReader:
+    """Reads JSON values from a text stream, without loading the full stream.
+
+    The stream is read in chunks.
+    Only the value that is currently being parsed is kept in memory.
+    """
+
+    def __init__(self, f: IO[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        # Read at least as much as is already buffered.
+        # This keeps the cost of re-parsing large values linear.
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace, and returns the next character"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def expect(self, char: str):
+        actual = self.peek()
+        if actual != char:
+            raise ValueError(f'Expected `{char}` in JSON input, got `{actual}`')
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # Numbers may have been cut off by the end of the buffer
+            if end == len(self.buf) and self._fill():
+                continue
+
+            self.pos = end
+            return value
+
+    def items(self) -> Generator[Any, None, None]:
+        """Yields items from the array that starts at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+
+def iter_array(f: IO[str],
+               key: Optional[str] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE,
+               ) -> Generator[Any, None, None]:
+    """Yields items from a JSON array in a text stream.
+
+    If `key` is set, the stream must contain an object,
+    and the array is the value of `key` in that object.
+    Other fields in the object are skipped.
+    If `key` is not found, no items are yielded.
+    """
+    reader = JsonReader(f, chunk_size)
+
+    if key is None:
+        yield from reader.items()
+        return
+
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        field = reader.value()
+        reader.expect(':')
+        if field == key:
+            yield from reader.items()
+            return
+        reader.value()
+        if reader.peek() == '}':
+            return
+        reader.expect(',')
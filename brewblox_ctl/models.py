@@ -2,6 +2,10 @@ from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
+# Increment this when fields are added, removed, or changed in CtlConfig or its nested models.
+# Cached configuration with a different schema version is discarded.
+CONFIG_SCHEMA_VERSION = 1
+
 
 class ComposeConfig(BaseModel):
     project: str = Field(default='brewblox',
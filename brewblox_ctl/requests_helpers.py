@@ -0,0 +1,60 @@
+"""
+Custom overrides for requests
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT_S = 30
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_S = 0.5
+DEFAULT_POOL_SIZE = 10
+
+# Responses that indicate the service is temporarily unavailable
+RETRY_STATUS_CODES = [429, 502, 503, 504]
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies a default timeout to all requests.
+    Requests never time out if the timeout is not set.
+    """
+
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT_S, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = timeout
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def session(timeout=DEFAULT_TIMEOUT_S,
+            retries=DEFAULT_RETRIES,
+            backoff=DEFAULT_BACKOFF_S,
+            pool_size=DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Creates a keep-alive session for repeated or concurrent requests.
+
+    Connection errors and responses with a status in RETRY_STATUS_CODES
+    are retried with exponential backoff.
+    If all attempts failed, the last response is returned.
+
+    Certificates are not verified: Brewblox uses self-signed certificates.
+    """
+    retry = Retry(total=retries,
+                  backoff_factor=backoff,
+                  status_forcelist=RETRY_STATUS_CODES,
+                  allowed_methods=None,
+                  raise_on_status=False)
+    adapter = TimeoutHTTPAdapter(timeout=timeout,
+                                 max_retries=retry,
+                                 pool_connections=pool_size,
+                                 pool_maxsize=pool_size)
+    s = requests.Session()
+    s.verify = False
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    return s
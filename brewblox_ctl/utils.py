@@ -3,6 +3,7 @@ Utility functions
 """
 
 import grp
+import hashlib
 import json
 import os
 import platform
@@ -12,12 +13,13 @@ import shlex
 import shutil
 import socket
 import string
-from contextlib import contextmanager
+import time
+from contextlib import contextmanager, nullcontext, redirect_stdout, suppress
 from functools import lru_cache
 from pathlib import Path
 from subprocess import DEVNULL, PIPE, STDOUT, CalledProcessError, Popen, run
 from tempfile import NamedTemporaryFile
-from typing import Dict, Generator, List, Union
+from typing import Dict, Generator, List, Optional, TextIO, Union
 
 import click
 import dotenv
@@ -27,7 +29,7 @@ from ruamel.yaml import YAML, CommentedMap
 from ruamel.yaml.compat import StringIO
 
 from . import const
-from .models import CtlConfig, CtlOpts
+from .models import CONFIG_SCHEMA_VERSION, CtlConfig, CtlOpts
 
 PathLike_ = Union[str, os.PathLike]
 
@@ -39,13 +41,59 @@ def get_opts() -> CtlOpts:
     return CtlOpts()
 
 
+def config_cache_key() -> str:
+    """
+    Identifies the current content of brewblox.yml, and the schema used to validate it.
+    """
+    stat = const.CONFIG_FILE.stat()
+    return json.dumps({
+        'schema': CONFIG_SCHEMA_VERSION,
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': hashlib.sha256(const.CONFIG_FILE.read_bytes()).hexdigest(),
+    })
+
+
+def read_config_cache(key: str) -> Optional[CtlConfig]:
+    """
+    Loads previously validated config.
+    The first line of the cache file is the cache key, the rest is the config as JSON.
+    """
+    try:
+        header, _, body = const.CONFIG_CACHE_FILE.read_text().partition('\n')
+        if header == key:
+            return CtlConfig.model_validate_json(body)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def write_config_cache(key: str, config: CtlConfig):
+    """
+    Stores validated config.
+    The cache is an optimization: write errors are ignored.
+    """
+    with suppress(OSError):
+        path = const.CONFIG_CACHE_FILE
+        tmp = path.with_name(f'{path.name}.{os.getpid()}')
+        tmp.write_text(key + '\n' + config.model_dump_json())
+        tmp.replace(path)
+
+
 @lru_cache
 def get_config() -> CtlConfig:
     if not const.CONFIG_FILE.exists():
         return CtlConfig()
 
+    # Parsing YAML and validating the result is relatively slow.
+    # The validated config is cached until brewblox.yml or the schema changes.
     try:
-        return CtlConfig.model_validate(yaml.load(const.CONFIG_FILE))
+        key = config_cache_key()
+        config = read_config_cache(key)
+        if config is None:
+            config = CtlConfig.model_validate(yaml.load(const.CONFIG_FILE))
+            write_config_cache(key, config)
+        return config
     except Exception as ex:
         click.secho(f'Loading `{const.CONFIG_FILE}` failed with a {strex(ex)}', err=True)
         raise SystemExit(1)
@@ -197,11 +245,83 @@ def is_docker_user() -> bool:
     return 'docker' in [grp.getgrgid(g).gr_name for g in os.getgroups()]
 
 
+def read_capability(key: str, fingerprint: dict) -> Optional[bool]:
+    """
+    Get a cached capability check result.
+    Returns None if the result is missing, expired, or was checked for a different fingerprint.
+    """
+    try:
+        entry = json.loads(const.CAPABILITIES_CACHE_FILE.read_text())[key]
+        age = time.time() - entry['timestamp']
+        if entry['fingerprint'] == fingerprint and 0 <= age < const.CAPABILITIES_CACHE_TTL_S:
+            return bool(entry['value'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_capability(key: str, fingerprint: dict, value: bool):
+    """
+    Store a capability check result.
+    The cache is an optimization: write errors are ignored.
+    """
+    with suppress(OSError):
+        path = const.CAPABILITIES_CACHE_FILE
+        try:
+            content = json.loads(path.read_text())
+        except (OSError, ValueError):
+            content = {}
+        content[key] = {
+            'fingerprint': fingerprint,
+            'timestamp': time.time(),
+            'value': value,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}')
+        tmp.write_text(json.dumps(content))
+        tmp.replace(path)
+
+
+def docker_rights_fingerprint() -> dict:
+    """
+    Collects system state that affects whether the user can use docker without sudo.
+    If any of these values change, a cached docker rights check is invalid.
+    """
+    fingerprint = {
+        'uid': os.geteuid(),
+        'groups': sorted(os.getgroups()),
+        'socket': None,
+        'binary': None,
+    }
+
+    with suppress(OSError):
+        stat = os.stat(const.DOCKER_SOCKET)
+        fingerprint['socket'] = [stat.st_ino, stat.st_mode, stat.st_uid, stat.st_gid]
+
+    with suppress(OSError, TypeError):
+        fingerprint['binary'] = os.stat(shutil.which('docker')).st_mtime_ns
+
+    return fingerprint
+
+
+@lru_cache
 def has_docker_rights():
     # Can current user run docker commands without sudo?
     # The shell must be reloaded after adding a user to the 'docker' group,
-    # so a strict group membership check is not sufficient
-    return 'permission denied' not in sh('docker version 2>&1', capture=True, check=False)
+    # so a strict group membership check is not sufficient.
+    # The result is memoized for this process, and cached on disk with a short TTL.
+    fingerprint = docker_rights_fingerprint()
+    cached = read_capability('docker_rights', fingerprint)
+    if cached is not None:
+        return cached
+
+    value = 'permission denied' not in sh('docker version 2>&1', capture=True, check=False)
+
+    # Commands are not executed during dry runs
+    if not get_opts().dry_run:
+        write_capability('docker_rights', fingerprint, value)
+
+    return value
 
 
 def is_brewblox_dir(dir: str) -> bool:
@@ -248,6 +368,7 @@ def downed_services():
         yield
 
 
+@lru_cache
 def cache_sudo():
     """Elevated privileges are cached for default 15m"""
     sh('sudo true', silent=True)
@@ -295,6 +416,52 @@ def sh(cmd: str, check=True, capture=False, silent=False) -> str:
     return result.stdout or ''
 
 
+def opts_args() -> List[str]:
+    """
+    Returns the global brewblox-ctl options that match current opts.
+    Dry run mode is never included: commands are not started during a dry run.
+    """
+    opts = get_opts()
+    args = []
+    if opts.yes:
+        args.append('--yes')
+    if opts.quiet:
+        args.append('--quiet')
+    if opts.verbose:
+        args.append('--verbose')
+    if opts.color is not None:
+        args.append('--color' if opts.color else '--no-color')
+    return args
+
+
+def ctl(cmd: click.Command, *args: str, stdout: Optional[TextIO] = None):
+    """
+    Runs a top-level brewblox-ctl command in the current process.
+
+    This is equivalent to `sh(f'{const.CLI} {cmd.name} {args}')`,
+    but without the cost of starting and initializing a new Python interpreter.
+    Global options are shared with the current invocation.
+
+    If `stdout` is set, command output is written there.
+    """
+    opts = get_opts()
+    cmd_args = [cmd.name, *args]
+    if opts.verbose or opts.dry_run:
+        click.secho(f'{const.LOG_PYTHON} {const.CLI} {shlex.join(cmd_args)}', fg='magenta', color=opts.color)
+    if opts.dry_run:
+        return
+
+    # Commands that restart themselves must do so with the arguments of this call
+    prev_args = const.ARGS
+    const.ARGS = [prev_args[0], *opts_args(), *cmd_args]
+
+    try:
+        with redirect_stdout(stdout) if stdout else nullcontext():
+            cmd.main(list(args), prog_name=f'{const.CLI} {cmd.name}', standalone_mode=False)
+    finally:
+        const.ARGS = prev_args
+
+
 def sh_stream(cmd: str) -> Generator[str, None, None]:
     opts = get_opts()
     if opts.verbose or opts.dry_run:
@@ -3,7 +3,10 @@ Tests brewblox_ctl.commands.backup
 """
 
 import json
+import re
 import zipfile
+from glob import glob
+from io import BytesIO
 from pathlib import Path
 from unittest.mock import Mock, call
 
@@ -13,8 +16,9 @@ import yaml
 from pytest_mock import MockerFixture
 from requests import HTTPError
 
+from brewblox_ctl import utils
 from brewblox_ctl.commands import backup
-from brewblox_ctl.testing import invoke, matching
+from brewblox_ctl.testing import invoke
 
 TESTED = backup.__name__
 HOST_URL = 'https://localhost:9600'
@@ -69,10 +73,10 @@ def zipf_names():
     ]
 
 
-def zipf_read():
-    return [
-        'BREWBLOX_RELEASE=9001'.encode(),
-        yaml.safe_dump({
+def zipf_content():
+    return {
+        '.env': 'BREWBLOX_RELEASE=9001'.encode(),
+        'docker-compose.yml': yaml.safe_dump({
             'version': '3.7',
             'services': {
                 'spark-one': {
@@ -83,17 +87,17 @@ def zipf_read():
                     'image': 'brewblox/brewblox-plaato:rpi-edge',
                 }
             }}).encode(),
-        json.dumps({'values': []}).encode(),
-        json.dumps([
+        'global.redis.json': json.dumps(redis_data()).encode(),
+        'brewblox-ui-store.datastore.json': json.dumps([
             {'_id': 'module__obj', '_rev': '1234', 'k': 'v'},
             {'_id': 'invalid', '_rev': '4321', 'k': 'v'},
         ]).encode(),
-        json.dumps([
+        'spark-service.datastore.json': json.dumps([
             {'_id': 'spark-id', '_rev': '1234', 'k': 'v'},
         ]).encode(),
-        json.dumps({'blocks': []}).encode(),
-        json.dumps({'blocks': [], 'other': []}).encode(),
-    ]
+        'spark-one.spark.json': json.dumps({'blocks': []}).encode(),
+        'spark-two.spark.json': json.dumps({'blocks': [], 'other': []}).encode(),
+    }
 
 
 def redis_data():
@@ -111,11 +115,24 @@ def blocks_data():
 @pytest.fixture
 def m_zipf(mocker: MockerFixture):
     m: Mock = mocker.patch(TESTED + '.zipfile.ZipFile').return_value
+    content = zipf_content()
     m.namelist.return_value = zipf_names()
-    m.read.side_effect = zipf_read()
+    m.read.side_effect = lambda name: content[name]
+    m.open.side_effect = lambda name: BytesIO(content[name])
     return m
 
 
+@pytest.fixture
+def m_session(mocker: MockerFixture) -> Mock:
+    m = mocker.patch(TESTED + '.requests_helpers.session')
+    return m.return_value.__enter__.return_value
+
+
+@pytest.fixture
+def m_wait(mocker: MockerFixture) -> Mock:
+    return mocker.patch(TESTED + '.http.wait', autospec=True)
+
+
 def set_responses():
     httpretty.register_uri(
         httpretty.GET,
@@ -168,39 +185,87 @@ def f_read_compose(m_read_compose: Mock):
         }}
 
 
+@pytest.fixture
+def f_backup_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, m_glob: Mock):
+    monkeypatch.chdir(tmp_path)
+    Path('.env').write_text('BREWBLOX_RELEASE=9001\n')
+    Path('docker-compose.yml').write_text('services: {}\n')
+    for fname in m_glob.return_value:
+        Path(fname).parent.mkdir(parents=True, exist_ok=True)
+        Path(fname).write_text(f'content of {fname}')
+    m_glob.side_effect = glob
+    return tmp_path
+
+
+def read_archive(backup_dir: Path) -> dict:
+    archive = next(backup_dir.glob('backup/*.zip'))
+    with zipfile.ZipFile(archive) as zipf:
+        return {name: zipf.read(name).decode() for name in zipf.namelist()}
+
+
 @httpretty.activate(allow_net_connect=False)
-def test_save_backup(mocker: MockerFixture, f_read_compose):
+def test_save_backup(f_backup_dir: Path, f_read_compose):
     set_responses()
-    m_mkdir = mocker.patch(TESTED + '.mkdir')
-    m_zipfile = mocker.patch(TESTED + '.zipfile.ZipFile')
 
-    invoke(backup.save)
+    result = invoke(backup.save)
 
-    m_mkdir.assert_called_once_with(Path('backup/').resolve())
-    m_zipfile.assert_called_once_with(
-        matching(r'^backup/brewblox_backup_\d{8}_\d{4}.zip'), 'w', zipfile.ZIP_DEFLATED)
-    m_zipfile.return_value.write.assert_any_call('docker-compose.yml')
-    assert m_zipfile.return_value.writestr.call_args_list == [
-        call('global.redis.json', json.dumps(redis_data())),
-        call('spark-one.spark.json', json.dumps(blocks_data())),
+    assert re.search(r'/backup/brewblox_backup_\d{8}_\d{4}.zip$', result.stdout, re.MULTILINE)
+    entries = read_archive(f_backup_dir)
+    assert list(entries.keys())[:4] == [
+        '.env',
+        'global.redis.json',
+        'docker-compose.yml',
+        'spark-one.spark.json',
+    ]
+    assert sorted(list(entries.keys())[4:]) == [
+        'node-red/flows.json',
+        'node-red/lib/flows/flows.json',
+        'node-red/settings.js',
     ]
+    assert entries['global.redis.json'] == json.dumps(redis_data())
+    assert entries['spark-one.spark.json'] == json.dumps(blocks_data())
     # wait, get datastore, get spark
     assert len(httpretty.latest_requests()) == 3
 
 
 @httpretty.activate(allow_net_connect=False)
-def test_save_backup_no_compose(mocker: MockerFixture, m_zipf: Mock, f_read_compose):
+def test_save_backup_multiple_sparks(mocker: MockerFixture, f_backup_dir: Path, m_read_compose: Mock):
+    set_responses()
+    mocker.patch(TESTED + '.SPOOL_MAX_SIZE', 2)
+    m_read_compose.return_value = {
+        'services': {
+            'spark-two': {
+                'image': 'ghcr.io/brewblox/brewblox-devcon-spark:rpi-edge',
+            },
+            'spark-one': {
+                'image': 'ghcr.io/brewblox/brewblox-devcon-spark:rpi-edge',
+            },
+        }}
+
+    invoke(backup.save)
+
+    entries = read_archive(f_backup_dir)
+    assert [k for k in entries.keys() if k.endswith('.spark.json')] == [
+        'spark-two.spark.json',
+        'spark-one.spark.json',
+    ]
+    assert entries['spark-two.spark.json'] == json.dumps(blocks_data())
+    # wait, get datastore, 2x get spark
+    assert len(httpretty.latest_requests()) == 4
+
+
+@httpretty.activate(allow_net_connect=False)
+def test_save_backup_no_compose(f_backup_dir: Path, f_read_compose):
     set_responses()
-    mocker.patch(TESTED + '.mkdir')
     invoke(backup.save, '--no-save-compose')
-    assert m_zipf.write.call_count == 13  # env + 4x glob
+    entries = read_archive(f_backup_dir)
+    assert 'docker-compose.yml' not in entries
+    assert len(entries) == 6
 
 
 @httpretty.activate(allow_net_connect=False)
-def test_save_backup_spark_err(mocker: MockerFixture, m_zipf, f_read_compose):
+def test_save_backup_spark_err(f_backup_dir: Path, f_read_compose):
     set_responses()
-    mocker.patch(TESTED + '.mkdir')
-    m_zipfile = mocker.patch(TESTED + '.zipfile.ZipFile')
 
     httpretty.register_uri(
         httpretty.POST,
@@ -212,18 +277,13 @@ def test_save_backup_spark_err(mocker: MockerFixture, m_zipf, f_read_compose):
 
     invoke(backup.save, '--no-save-compose', _err=HTTPError)
 
-    assert m_zipfile.return_value.writestr.call_args_list == [
-        call('global.redis.json', json.dumps(redis_data())),
-    ]
     # wait, get datastore, get spark
     assert len(httpretty.latest_requests()) == 3
 
 
 @httpretty.activate(allow_net_connect=False)
-def test_save_backup_ignore_spark_err(mocker: MockerFixture, m_zipf, f_read_compose):
+def test_save_backup_ignore_spark_err(f_backup_dir: Path, f_read_compose):
     set_responses()
-    mocker.patch(TESTED + '.mkdir')
-    m_zipfile = mocker.patch(TESTED + '.zipfile.ZipFile')
 
     httpretty.register_uri(
         httpretty.POST,
@@ -235,25 +295,71 @@ def test_save_backup_ignore_spark_err(mocker: MockerFixture, m_zipf, f_read_comp
 
     invoke(backup.save, '--no-save-compose --ignore-spark-error')
 
-    assert m_zipfile.return_value.writestr.call_args_list == [
-        call('global.redis.json', json.dumps(redis_data())),
-    ]
+    entries = read_archive(f_backup_dir)
+    assert 'global.redis.json' in entries
+    assert 'spark-one.spark.json' not in entries
     # wait, get datastore, get spark
     assert len(httpretty.latest_requests()) == 3
 
 
-def test_load_backup_empty(m_sh: Mock, m_zipf):
+def test_load_backup_empty(m_sh: Mock, m_ctl: Mock, m_zipf):
     m_zipf.namelist.return_value = []
 
     invoke(backup.load, 'fname')
-    assert m_sh.call_count == 1  # Only the update
+    assert m_sh.call_count == 0
+    m_ctl.assert_called_once_with(backup.update_commands.update)
 
 
-def test_load_backup(mocker: MockerFixture, m_zipf):
+def test_load_backup(mocker: MockerFixture, m_ctl: Mock, m_zipf, m_session: Mock):
     m_tmp = mocker.patch(TESTED + '.NamedTemporaryFile', wraps=backup.NamedTemporaryFile)
     invoke(backup.load, 'fname')
-    assert m_zipf.read.call_count == 7
-    assert m_tmp.call_count == 6
+    # .env, compose, 2x spark
+    assert m_zipf.read.call_count == 4
+    # redis, ui-store, spark-service
+    assert m_zipf.open.call_count == 3
+    assert m_tmp.call_count == 1
+    # wait, 2x mdelete, 2x spark, update
+    assert m_ctl.call_count == 6
+    m_ctl.assert_any_call(backup.http.http, 'wait', 'http://localhost:9600/history/datastore/ping')
+
+    mset_url = 'http://localhost:9600/history/datastore/mset'
+    assert m_session.post.call_args_list == [
+        call(mset_url, json=redis_data()),
+        call(mset_url, json={'values': [
+            {'namespace': 'brewblox-ui-store:module', 'id': 'obj', '_rev': '1234', 'k': 'v'},
+        ]}),
+        call(mset_url, json={'values': [
+            {'namespace': 'spark-service', 'id': 'spark-id', '_rev': '1234', 'k': 'v'},
+        ]}),
+    ]
+
+
+def test_load_backup_batched(mocker: MockerFixture, m_zipf, m_session: Mock):
+    mocker.patch(TESTED + '.DATASTORE_BATCH_SIZE', 1)
+    mocker.patch(TESTED + '.DATASTORE_WORKERS', 1)
+    mocker.patch(TESTED + '.PROGRESS_INTERVAL_S', 0)
+    m_zipf.namelist.return_value = ['global.redis.json']
+
+    invoke(backup.load, 'fname --no-update')
+    # Batches are written concurrently, and may complete in any order
+    written = [v
+               for c in m_session.post.call_args_list
+               for v in c.kwargs['json']['values']]
+    assert sorted(written, key=lambda v: v['id']) == redis_data()['values']
+    assert m_session.post.call_count == 3
+
+
+def test_load_backup_datastore_dry_run(m_zipf, m_session: Mock):
+    utils.get_opts().dry_run = True
+    m_zipf.namelist.return_value = ['global.redis.json']
+    invoke(backup.load, 'fname --no-update')
+    assert m_session.post.call_count == 0
+
+
+def test_load_backup_datastore_err(m_zipf, m_session: Mock):
+    m_session.post.return_value.raise_for_status.side_effect = HTTPError
+    m_zipf.namelist.return_value = ['global.redis.json']
+    invoke(backup.load, 'fname --no-update', _err=HTTPError)
 
 
 def test_load_backup_none(m_sh, m_zipf):
@@ -271,16 +377,15 @@ def test_load_backup_none(m_sh, m_zipf):
     assert m_sh.call_count == 1
 
 
-def test_load_backup_missing(mocker: MockerFixture, m_zipf):
+def test_load_backup_missing(mocker: MockerFixture, m_zipf, m_session):
     m_tmp = mocker.patch(TESTED + '.NamedTemporaryFile', wraps=backup.NamedTemporaryFile)
     m_zipf.namelist.return_value = zipf_names()[2:]
-    m_zipf.read.side_effect = zipf_read()[2:]
     invoke(backup.load, 'fname')
-    assert m_zipf.read.call_count == 5
-    assert m_tmp.call_count == 5
+    assert m_zipf.read.call_count == 2
+    assert m_tmp.call_count == 0
 
 
-def test_load_backup_other_uid(mocker: MockerFixture, m_sh, m_zipf, m_getuid):
+def test_load_backup_other_uid(mocker: MockerFixture, m_sh, m_zipf, m_session, m_getuid):
     m_getuid.return_value = 1001
     mocker.patch(TESTED + '.NamedTemporaryFile', wraps=backup.NamedTemporaryFile)
     invoke(backup.load, 'fname')
@@ -14,6 +14,12 @@ from brewblox_ctl.testing import invoke
 TESTED = diagnostic.__name__
 
 
+@pytest.fixture(autouse=True)
+def m_cwd(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
 @pytest.fixture(autouse=True)
 def m_utils(m_read_compose: Mock, m_read_shared_compose: Mock, m_list_services: Mock):
     m_read_compose.side_effect = lambda: {
@@ -56,6 +62,14 @@ def test_log_service_error(m_read_compose: Mock):
     invoke(diagnostic.log)
 
 
+def test_log_blocks(m_ctl: Mock, m_cwd: Path):
+    m_ctl.side_effect = [None, RuntimeError('Boo!')]
+    invoke(diagnostic.log, '--no-add-system --no-upload')
+    assert m_ctl.call_count == 2
+    assert m_ctl.call_args[0][:2] == (diagnostic.http.http, 'post')
+    assert 'RuntimeError(Boo!)' in (m_cwd / 'brewblox.log').read_text()
+
+
 def test_coredump(m_start_esptool: Mock, m_file_netcat: Mock, m_command_exists: Mock):
     invoke(diagnostic.coredump)
     assert m_file_netcat.call_count == 1
@@ -191,6 +191,13 @@ def m_sh_stream(monkeypatch: pytest.MonkeyPatch):
     yield m
 
 
+@pytest.fixture(autouse=True)
+def m_ctl(monkeypatch: pytest.MonkeyPatch):
+    m = Mock(spec=utils.ctl)
+    monkeypatch.setattr(utils, 'ctl', m)
+    yield m
+
+
 @pytest.fixture(autouse=True)
 def m_check_ok(monkeypatch: pytest.MonkeyPatch):
     m = Mock(spec=utils.check_ok)
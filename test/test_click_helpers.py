@@ -52,3 +52,22 @@ def test_ordered_commands():
         'cmd-two-one',
         '-cmd-two-two',
     ]
+
+
+def test_lazy_commands():
+    cli = click_helpers.LazyCommandCollection(
+        lazy_sources={
+            'http': 'brewblox_ctl.commands.http',
+            'follow': 'brewblox_ctl.commands.docker',
+            'up': 'brewblox_ctl.commands.docker',
+        })
+
+    assert cli.list_commands(None) == [
+        'http',
+        'follow',
+        'up',
+    ]
+
+    assert cli.get_command(None, 'follow').name == 'follow'
+    assert cli.get_command(None, 'http').name == 'http'
+    assert cli.get_command(None, 'pancakes') is None
@@ -0,0 +1,60 @@
+"""
+Tests brewblox_ctl.json_stream
+"""
+
+import json
+from io import StringIO
+
+import pytest
+
+from brewblox_ctl import json_stream
+
+TESTED = json_stream.__name__
+
+
+def values(count: int):
+    return [
+        {'namespace': f'n{i}', 'id': f'id{i}', 'data': {'nested': [i, i * 1.5, 'text' * i]}}
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 16, 1024])
+def test_iter_array(chunk_size: int):
+    data = values(20)
+    content = json.dumps(data, indent=2)
+    assert list(json_stream.iter_array(StringIO(content), chunk_size=chunk_size)) == data
+
+    content = json.dumps({'before': {'values': [1, 2]}, 'values': data, 'after': 1})
+    assert list(json_stream.iter_array(StringIO(content), 'values', chunk_size)) == data
+
+    content = json.dumps([123456, -1.5e10, True, None, 'string'])
+    assert list(json_stream.iter_array(StringIO(content), chunk_size=chunk_size)) \
+        == [123456, -1.5e10, True, None, 'string']
+
+
+def test_iter_array_empty():
+    assert list(json_stream.iter_array(StringIO('[]'))) == []
+    assert list(json_stream.iter_array(StringIO(' [ ] '))) == []
+    assert list(json_stream.iter_array(StringIO('{}'), 'values')) == []
+    assert list(json_stream.iter_array(StringIO('{"values": []}'), 'values')) == []
+    assert list(json_stream.iter_array(StringIO('{"other": []}'), 'values')) == []
+
+
+def test_iter_array_trailing_number():
+    # The number is cut off by the end of the first chunk
+    reader = json_stream.JsonReader(StringIO('12345'), chunk_size=2)
+    assert reader.value() == 12345
+
+
+@pytest.mark.parametrize('content', [
+    '',
+    '{}',
+    '[1, 2',
+    '[1 2]',
+    '[{"k": }]',
+    '[{"k": "v"',
+])
+def test_iter_array_invalid(content: str):
+    with pytest.raises(ValueError):
+        list(json_stream.iter_array(StringIO(content), chunk_size=2))
@@ -2,6 +2,9 @@
 Tests brewblox_ctl.__main__
 """
 
+import importlib
+import subprocess
+import sys
 from tempfile import NamedTemporaryFile
 from unittest.mock import Mock
 
@@ -13,6 +16,12 @@ from brewblox_ctl import utils
 
 TESTED = main.__name__
 
+# Max duration for importing brewblox-ctl and rendering `brewblox-ctl follow --help`
+STARTUP_BUDGET_S = 1.0
+
+# Dependencies that are not required to resolve a lightweight command
+LAZY_MODULES = ['zeroconf', 'usb', 'requests', 'passlib', 'jinja2', 'configobj']
+
 
 @pytest.fixture(autouse=True)
 def m_ensure_tty(mocker: MockerFixture):
@@ -58,3 +67,37 @@ def test_exception(m_is_root: Mock):
 
     with pytest.raises(SystemExit):
         main.main(['pancakes'])
+
+
+def test_commands():
+    modules = dict.fromkeys(main.COMMANDS.values())
+    names = []
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        names += module.cli.list_commands(None)
+
+    assert names == list(main.COMMANDS.keys())
+
+
+def test_startup_budget():
+    script = '\n'.join([
+        'import sys, time',
+        'start = time.perf_counter()',
+        'import click',
+        'from brewblox_ctl import __main__ as main, click_helpers',
+        'group = click_helpers.LazyCommandCollection(lazy_sources=main.COMMANDS)',
+        'cmd = group.get_command(None, "follow")',
+        'cmd.get_help(click.Context(cmd))',
+        'print(time.perf_counter() - start)',
+        'print(" ".join(sys.modules))',
+    ])
+    result = subprocess.run([sys.executable, '-c', script],
+                            check=True,
+                            capture_output=True,
+                            text=True)
+    duration, modules = result.stdout.splitlines()
+    modules = modules.split(' ')
+
+    assert float(duration) < STARTUP_BUDGET_S
+    for name in LAZY_MODULES:
+        assert name not in modules
@@ -0,0 +1,50 @@
+"""
+Tests brewblox_ctl.requests_helpers
+"""
+
+import httpretty
+from pytest_mock import MockerFixture
+
+from brewblox_ctl import requests_helpers
+
+TESTED = requests_helpers.__name__
+
+
+def test_default_timeout(mocker: MockerFixture):
+    m_send = mocker.patch(TESTED + '.HTTPAdapter.send', autospec=True)
+    adapter = requests_helpers.TimeoutHTTPAdapter(timeout=5)
+
+    adapter.send('request')
+    assert m_send.call_args.kwargs['timeout'] == 5
+
+    adapter.send('request', timeout=10)
+    assert m_send.call_args.kwargs['timeout'] == 10
+
+
+@httpretty.activate(allow_net_connect=False)
+def test_session_retry():
+    httpretty.register_uri(
+        httpretty.POST,
+        'http://localhost/retried',
+        responses=[
+            httpretty.Response(body='busy', status=503),
+            httpretty.Response(body='busy', status=502),
+            httpretty.Response(body='ok', status=200),
+        ])
+    httpretty.register_uri(
+        httpretty.POST,
+        'http://localhost/failed',
+        body='boo',
+        status=500,
+    )
+
+    with requests_helpers.session(backoff=0) as session:
+        assert session.verify is False
+
+        resp = session.post('http://localhost/retried')
+        assert resp.status_code == 200
+        assert len(httpretty.latest_requests()) == 3
+
+        resp = session.post('http://localhost/failed')
+        assert resp.status_code == 500
+        assert len(httpretty.latest_requests()) == 4